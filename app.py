@@ -1,7 +1,17 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import awswrangler as wr
 import plotly.express as px
+from kernels import store_stats
+
+# Arrow-backed strings keep user_id / restaurant_id out of Python object arrays
+pd.options.future.infer_string = True
 
 st.set_page_config(page_title="GlobalPartners Analytics", layout="wide")
 
@@ -20,25 +30,198 @@ st.header("testing - CI/CD should trigger and deploy this change to the dashboar
 # Note: Locally, this uses your AWS CLI credentials. On ECS, it uses the Task Role.
 DATABASE = "globalpartners_gold_db"
 
-@st.cache_data(ttl=3600) # Caches data for 1 hour so it's snappy
-def load_gold_data(table):
-    return wr.athena.read_sql_query(sql=f"SELECT * FROM {table}", database=DATABASE)
+# Parquet snapshots of the gold tables, one per business date. The local default only
+# survives Streamlit restarts inside a task (Fargate wipes /tmp on a new task); set
+# GOLD_CACHE_PATH to an s3:// prefix so cold tasks skip Athena and share one snapshot.
+CACHE_PATH = os.environ.get("GOLD_CACHE_PATH", "/tmp/gold_cache").rstrip("/")
+ATHENA_S3_OUTPUT = os.environ.get("ATHENA_S3_OUTPUT")  # None = workgroup default
+REFRESH_TZ = ZoneInfo(os.environ.get("REFRESH_TZ", "UTC"))  # Timezone of the 8 AM schedule
+REFRESH_HOUR = 8  # Gold tables are rebuilt daily at 8:00 AM
+REFRESH_GRACE = timedelta(hours=1)  # Leave the rebuild time to finish before rolling over
+
+
+def last_rollover():
+    # Most recent point at which a fresh business date starts: 8 AM plus the grace period
+    now = datetime.now(REFRESH_TZ)
+    rollover = now.replace(hour=REFRESH_HOUR, minute=0, second=0, microsecond=0) + REFRESH_GRACE
+    if now < rollover:
+        rollover -= timedelta(days=1)
+    return rollover
+
+
+def current_business_date():
+    # Before the rollover we are still serving yesterday's data
+    return last_rollover().strftime("%Y-%m-%d")
+
+
+def read_cached_parquet(path, columns=None):
+    try:
+        if path.startswith("s3://"):
+            return wr.s3.read_parquet(path, columns=columns)
+        return pd.read_parquet(path, columns=columns)
+    except (wr.exceptions.NoFilesFound, FileNotFoundError):
+        return None
+
+
+def write_cached_parquet(df, path):
+    if path.startswith("s3://"):
+        wr.s3.to_parquet(df, path=path, compression="zstd")
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path, compression="zstd", index=False)
+
+
+def prune_cached_parquet(path):
+    # Drop snapshots from earlier business dates or older queries once the current one is written
+    cache_dir = os.path.dirname(path)
+    if path.startswith("s3://"):
+        stale = [obj for obj in wr.s3.list_objects(f"{cache_dir}/") if obj != path]
+        if stale:
+            wr.s3.delete_objects(stale)
+    else:
+        for name in os.listdir(cache_dir):
+            stale = os.path.join(cache_dir, name)
+            if stale != path:
+                os.remove(stale)
+
+
+def query_with_cache(sql, cache_name, business_date, columns=None):
+    # The SQL hash retires a snapshot as soon as the query or its projection changes
+    sql_hash = hashlib.sha1(sql.encode()).hexdigest()[:8]
+    cache_file = f"{CACHE_PATH}/{cache_name}/{business_date}-{sql_hash}.parquet"
+    df = read_cached_parquet(cache_file, columns)
+    if df is not None:
+        return df
+
+    # Cache miss: go to Athena. UNLOAD hands the result back as Parquet instead of CSV.
+    # Athena result reuse can't match UNLOAD statements; the snapshot above is the reuse layer.
+    df = wr.athena.read_sql_query(
+        sql=sql,
+        database=DATABASE,
+        ctas_approach=False,
+        unload_approach=True,
+        s3_output=ATHENA_S3_OUTPUT,
+        keep_files=True,
+    )
+    write_cached_parquet(df, cache_file)
+    prune_cached_parquet(cache_file)
+    return df
 
-# Load all tables
-df_intel = load_gold_data("customer_intelligence")
 
-# --- 0. Data Cleaning (Add this after load_gold_data) ---
-# Convert Narwhals/Object types to standard numeric floats
-numeric_cols = ['current_clv', 'monetary_value', 'frequency', 'recency', 'avg_gap_between_orders', 'avg_spend_change_pct']
-for col in numeric_cols:
-    if col in df_intel.columns:
-        df_intel[col] = pd.to_numeric(df_intel[col], errors='coerce').fillna(0)
+def load_gold_data(table, business_date, columns=None):
+    # Only pull the columns the dashboard uses so Athena can skip the rest of the Parquet
+    projection = ", ".join(columns) if columns else "*"
+    return query_with_cache(f"SELECT {projection} FROM {table}", table, business_date, columns)
+
+
+# Table loaders do all dtype cleanup inside the cache, so it runs once per business
+# date instead of on every rerun. Keyed on business date so all users in a day share one
+# result; the hourly ttl re-checks the snapshot rather than pinning it for the day.
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_intel(business_date):
+    df = load_gold_data(
+        "customer_intelligence", business_date,
+        ['user_id', 'clv_tier', 'segment', 'current_clv', 'frequency', 'recency']
+    )
+    # Convert Narwhals/Object types to standard numeric floats
+    numeric_cols = ['current_clv', 'frequency', 'recency']
+    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0).astype('float32')
+    # Counts don't need to be floats at all
+    df[['frequency', 'recency']] = df[['frequency', 'recency']].astype('int32')
+
+    # Low-cardinality labels become categoricals so filters compare integer codes, not strings
+    df['clv_tier'] = pd.Categorical(df['clv_tier'], categories=['High', 'Medium', 'Low'])
+    df['segment'] = df['segment'].astype('category')
+    return df
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_rolling(business_date):
+    df = load_gold_data(
+        "customer_rolling_metrics", business_date,
+        ['user_id', 'order_date', 'running_clv']
+    )
+    df['running_clv'] = pd.to_numeric(df['running_clv'], errors='coerce').astype('float32')
+    # Date-ordered rows let the Section 1c groupby skip sorting and still come out in date order
+    return df.sort_values('order_date', kind='stable').reset_index(drop=True)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_trends(business_date):
+    df = load_gold_data(
+        "location_sales_trends", business_date,
+        ['order_date', 'restaurant_id', 'daily_revenue', 'daily_order_count', 'item_category']
+    )
+    df['order_date'] = pd.to_datetime(df['order_date'])
+    df['daily_revenue'] = pd.to_numeric(df['daily_revenue'], errors='coerce').astype('float32')
+    df['daily_order_count'] = pd.to_numeric(df['daily_order_count'], errors='coerce')
+    df['restaurant_id'] = df['restaurant_id'].astype('category')
+    df['item_category'] = df['item_category'].astype('category')
+    # Keep each store's rows contiguous and date-ordered for store_stats
+    return df.sort_values(['restaurant_id', 'order_date'], kind='stable').reset_index(drop=True)
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_loyalty(business_date):
+    return load_gold_data(
+        "loyalty_roi_analysis", business_date,
+        ['is_loyalty', 'avg_order_value', 'repeat_order_rate', 'total_lifetime_value', 'total_customers']
+    )
+
 
+@st.cache_data(ttl=3600)
+def load_trends_rollup(unit, business_date):
+    # Revenue per restaurant rolled up to 'day', 'week' or 'month' inside Athena,
+    # so only the aggregated rows reach the app
+    sql = f"""
+        SELECT date_trunc('{unit}', CAST(order_date AS date)) AS order_date,
+               restaurant_id,
+               SUM(TRY_CAST(daily_revenue AS double)) AS daily_revenue
+        FROM location_sales_trends
+        GROUP BY 1, 2
+    """
+    df = query_with_cache(sql, f"location_sales_trends_{unit}", business_date)
+    df['order_date'] = pd.to_datetime(df['order_date'])
+    df['restaurant_id'] = df['restaurant_id'].astype('category')
+    # GROUP BY output has no guaranteed order; px.line connects points in row order
+    return df.sort_values(['restaurant_id', 'order_date'], kind='stable').reset_index(drop=True)
+
+
+@st.cache_data(ttl=3600)
+def load_category_mix(business_date):
+    # Revenue per (restaurant, category); tiny enough to filter by restaurant in pandas
+    sql = """
+        SELECT restaurant_id,
+               item_category,
+               SUM(TRY_CAST(daily_revenue AS double)) AS daily_revenue
+        FROM location_sales_trends
+        GROUP BY 1, 2
+    """
+    df = query_with_cache(sql, "location_sales_trends_category_mix", business_date)
+    df['restaurant_id'] = df['restaurant_id'].astype('category')
+    return df
+
+
+def filter_restaurants(df, selected_locations):
+    # Match integer category codes instead of hashing restaurant_id strings
+    categories = df['restaurant_id'].cat.categories
+    sel_codes = categories.get_indexer(list(selected_locations))
+    sel_codes = sel_codes[sel_codes >= 0]
+    mask = np.isin(df['restaurant_id'].cat.codes.to_numpy(), sel_codes)
+    return df[mask]
+
+# Load all tables
+business_date = current_business_date()
+df_intel = load_intel(business_date)
+df_rolling = load_rolling(business_date)
+df_trends = load_trends(business_date)
+df_loyalty = load_loyalty(business_date)
+
+@st.cache_data(ttl=3600)
+def top_customers_sorted(_df, business_date):
+    # The leading underscore skips hashing the frame; business_date is the cache key
+    return _df[['user_id', 'current_clv', 'clv_tier']].nlargest(100, 'current_clv')
 
-df_rolling = load_gold_data("customer_rolling_metrics")
-df_trends = load_gold_data("location_sales_trends")
-df_loyalty = load_gold_data("loyalty_roi_analysis")
-df_discount = load_gold_data("discount_effectiveness")
 
 # --- 1. Customer Lifetime Value (CLV) ---
 st.header("1. Customer Lifetime Value (CLV)")
@@ -59,10 +242,12 @@ with st.expander("🔍 View Segmentation Definitions & Logic"):
 # 1a. Average CLV by Segment (KPI Metrics)
 st.subheader("Average CLV by Segment")
 
-# Calculate the averages
-avg_clv_high = df_intel[df_intel['clv_tier'] == 'High']['current_clv'].mean()
-avg_clv_med = df_intel[df_intel['clv_tier'] == 'Medium']['current_clv'].mean()
-avg_clv_low = df_intel[df_intel['clv_tier'] == 'Low']['current_clv'].mean()
+# Calculate the averages in a single groupby pass
+clv_means = df_intel.groupby('clv_tier', sort=False, observed=True)['current_clv'].mean().to_dict()
+
+avg_clv_high = clv_means.get('High', 0.0)
+avg_clv_med = clv_means.get('Medium', 0.0)
+avg_clv_low = clv_means.get('Low', 0.0)
 
 # Create 3 columns for the metrics
 col1, col2, col3 = st.columns(3)
@@ -84,62 +269,68 @@ st.subheader("Individual Customer CLV Comparison")
 # Add a slider to let the user choose how many top customers to view
 top_n = st.slider("Select number of top customers to compare", 5, 100, 20)
 
-# Sort by monetary_value and take the top N
-df_top_customers = df_intel.sort_values("current_clv", ascending=False).head(top_n)
-
-# Create a bar chart for individual comparison
-fig_user_comp = px.bar(
-    df_top_customers, 
-    x="user_id", 
-    y="current_clv",
-    color="clv_tier", # Color by tier to see how they align
-    text_auto='.2s', # Adds the dollar amount on top of the bars
-    title=f"Top {top_n} Customers by Lifetime Value",
-    labels={"current_clv": "Total Spend ($)", "user_id": "Customer ID"},
-    color_discrete_map={"High": "#00CC96", "Medium": "#636EFA", "Low": "#EF553B"}
-)
+# Create a bar chart for individual comparison, cached per slider value
+@st.cache_data(ttl=3600)
+def build_user_comp_fig(_df, top_n, business_date):
+    # Take the top N from a cached partial sort (slider max is 100)
+    df_top_customers = top_customers_sorted(_df, business_date).head(top_n)
+
+    fig_user_comp = px.bar(
+        df_top_customers, 
+        x="user_id", 
+        y="current_clv",
+        color="clv_tier", # Color by tier to see how they align
+        text_auto='.2s', # Adds the dollar amount on top of the bars
+        title=f"Top {top_n} Customers by Lifetime Value",
+        labels={"current_clv": "Total Spend ($)", "user_id": "Customer ID"},
+        color_discrete_map={"High": "#00CC96", "Medium": "#636EFA", "Low": "#EF553B"}
+    )
 
-# Improve readability by tilting the user IDs
-fig_user_comp.update_layout(xaxis_tickangle=-45)
+    # Improve readability by tilting the user IDs
+    fig_user_comp.update_layout(xaxis_tickangle=-45)
+    return fig_user_comp
 
+fig_user_comp = build_user_comp_fig(df_intel, top_n, business_date)
 st.plotly_chart(fig_user_comp, use_container_width=True, key="individual_user_clv_bar")
 
 
 # 1c. CLV Over Time by Segment (Line Chart)
 st.subheader("CLV by Segment Over Time")
 
-# 1. Prepare Data
-df_rolling_segmented = df_rolling.merge(df_intel[['user_id', 'clv_tier']], on='user_id')
-
-clv_trend = df_rolling_segmented.groupby(['order_date', 'clv_tier'])['running_clv'].sum().reset_index()
-
-# 2. Create 3 Columns
-col1, col2, col3 = st.columns(3)
+# 1. Prepare Data (cached per business date, so reruns skip the map and groupby)
+@st.cache_data(ttl=3600)
+def build_clv_trend(_intel, _rolling, business_date):
+    # Look up each user's tier instead of hash-joining on the string user_id
+    tier_by_user = _intel.set_index('user_id')['clv_tier']
+    df = _rolling.assign(clv_tier=_rolling['user_id'].map(tier_by_user).astype(_intel['clv_tier'].dtype))
+    return (
+        df.groupby(['order_date', 'clv_tier'], observed=True, sort=False)['running_clv']
+        .sum()
+        .reset_index()
+    )
 
-# Define a helper function to keep the code clean
-def plot_segment_trend(df, tier, color, key):
-    segment_data = df[df['clv_tier'] == tier]
+# 2. One faceted chart, one panel per tier; cached per business date
+@st.cache_data(ttl=3600)
+def build_segment_trend_fig(_intel, _rolling, business_date):
     fig = px.line(
-        segment_data, 
-        x="order_date", 
+        build_clv_trend(_intel, _rolling, business_date),
+        x="order_date",
         y="running_clv",
-        title=f"{tier} Segment Growth",
+        color="clv_tier",
+        facet_col="clv_tier",
+        category_orders={"clv_tier": ["High", "Medium", "Low"]},
         labels={"running_clv": "Cumulative CLV ($)", "order_date": "Date"},
-        color_discrete_sequence=[color]
+        color_discrete_map={"High": "#00CC96", "Medium": "#636EFA", "Low": "#EF553B"},
+        render_mode="webgl"
     )
     # Condense the layout for side-by-side view
-    fig.update_layout(height=300, margin=dict(l=20, r=20, t=40, b=20))
-    st.plotly_chart(fig, use_container_width=True, key=key)
+    fig.update_layout(height=300, showlegend=False, margin=dict(l=20, r=20, t=40, b=20))
+    fig.for_each_annotation(lambda a: a.update(text=f"{a.text.split('=')[-1]} Segment Growth"))
+    # Each tier keeps its own scale, as the separate charts did
+    fig.update_yaxes(matches=None, showticklabels=True)
+    return fig
 
-# 3. Render the 3 Charts
-with col1:
-    plot_segment_trend(clv_trend, "High", "#00CC96", "trend_high")
-
-with col2:
-    plot_segment_trend(clv_trend, "Medium", "#636EFA", "trend_medium")
-
-with col3:
-    plot_segment_trend(clv_trend, "Low", "#EF553B", "trend_low")
+st.plotly_chart(build_segment_trend_fig(df_intel, df_rolling, business_date), use_container_width=True, key="trend_facet")
 
 # --- 4. The Narrative Caption ---
 #  or st.info() for a more emphasized style
@@ -173,10 +364,11 @@ st.subheader("Segment Overview")
 
 # Calculate totals and percentages for context
 total_customers = len(df_intel)
-vips = len(df_intel[df_intel['segment'] == 'VIP'])
-new_custs = len(df_intel[df_intel['segment'] == 'New Customer'])
-churn_risk = len(df_intel[df_intel['segment'] == 'Churn Risk'])
-standard = len(df_intel[df_intel['segment'] == 'Standard'])
+segment_counts = df_intel['segment'].value_counts().to_dict()
+vips = int(segment_counts.get('VIP', 0))
+new_custs = int(segment_counts.get('New Customer', 0))
+churn_risk = int(segment_counts.get('Churn Risk', 0))
+standard = int(segment_counts.get('Standard', 0))
 
 col1, col2, col3, col4 = st.columns(4)
 
@@ -259,9 +451,10 @@ st.subheader("Recent Activity for High-Tier CLV Customers")
 df_high_clv = df_intel[df_intel['clv_tier'] == 'High']
 
 # 2. Calculate Counts for Activity Split
-at_risk_count = len(df_high_clv[df_high_clv['frequency'] == 0])
-active_count = len(df_high_clv[df_high_clv['frequency'] > 0])
-total_high = len(df_high_clv)
+freq = df_high_clv['frequency'].to_numpy()
+at_risk_count = int(np.count_nonzero(freq == 0))
+total_high = freq.size
+active_count = total_high - at_risk_count
 
 # 3. Create Two Columns for the Visuals
 col_hist, col_pie = st.columns([2, 1])
@@ -319,14 +512,12 @@ df_gap = df_intel[
 ]
 
 if not df_gap.empty:
-    # Format the dollar columns for the table
-    df_display = df_gap[['user_id', 'current_clv', 'recency', 'frequency']].copy()
-    df_display['current_clv'] = df_display['current_clv'].map("${:,.2f}".format)
-    
+    # Dollar formatting is left to the table renderer
     st.dataframe(
-        df_display.sort_values('recency', ascending=False), 
+        df_gap[['user_id', 'current_clv', 'recency', 'frequency']].sort_values('recency', ascending=False), 
         use_container_width=True,
-        hide_index=True
+        hide_index=True,
+        column_config={'current_clv': st.column_config.NumberColumn('CLV', format='$%.2f')}
     )
 
 
@@ -344,7 +535,8 @@ st.header("4. Sales Trends Monitoring")
 
 
 # Calculate the count of unique locations dynamically
-unique_locations = df_trends['restaurant_id'].nunique()
+all_restaurants = list(df_trends['restaurant_id'].cat.categories)
+unique_locations = len(all_restaurants)
 
 st.markdown(f"""
     There are **{unique_locations}** unique business locations in this dataset. 
@@ -353,11 +545,7 @@ st.markdown(f"""
     and compare the revenue trajectory of different storefronts side-by-side.
 """)
 
-# 1. Prepare Date Columns
-df_trends['order_date'] = pd.to_datetime(df_trends['order_date'])
-df_trends['daily_revenue'] = pd.to_numeric(df_trends['daily_revenue'], errors='coerce')
-
-# 2. Controls: Time Grain & Filters
+# 1. Controls: Time Grain & Filters
 col_a, col_b, col_c = st.columns([1, 1, 2])
 
 with col_a:
@@ -367,48 +555,56 @@ with col_b:
     # Filter by Location
     selected_locations = st.multiselect(
         "Filter by Restaurant", 
-        options=df_trends['restaurant_id'].unique(),
-        default=df_trends['restaurant_id'].unique()[:3] # Default to first 3
+        options=all_restaurants,
+        default=all_restaurants[:3] # Default to first 3
     )
 
-# 3. Reshape Data based on Time Grain
-df_filtered = df_trends[df_trends['restaurant_id'].isin(selected_locations)]
+# Figures below are cached on the selection, so only a changed filter rebuilds them
+selected_key = tuple(selected_locations)
+
+# 2. Pick the pre-aggregated frame for the Time Grain
+GRAIN_UNITS = {"Daily": "day", "Weekly": "week", "Monthly": "month"}
+
+@st.cache_data(ttl=3600)
+def build_sales_fig(selected_locations, time_grain, business_date):
+    df_rollup = load_trends_rollup(GRAIN_UNITS[time_grain], business_date)
+    df_plot = filter_restaurants(df_rollup, selected_locations)
+    return px.line(
+        df_plot,
+        x="order_date",
+        y="daily_revenue",
+        color="restaurant_id",
+        title=f"Total Sales Trend ({time_grain})",
+        labels={"daily_revenue": "Revenue ($)", "order_date": "Date"},
+        render_mode="webgl" # GPU-rendered, stays smooth with many restaurants/days
+    )
 
-if time_grain == "Weekly":
-    df_plot = df_filtered.groupby([pd.Grouper(key='order_date', freq='W'), 'restaurant_id'])['daily_revenue'].sum().reset_index()
-    x_axis = "order_date"
-elif time_grain == "Monthly":
-    df_plot = df_filtered.groupby([pd.Grouper(key='order_date', freq='M'), 'restaurant_id'])['daily_revenue'].sum().reset_index()
-    x_axis = "order_date"
+# This helps identify if a location is 'Breakfast heavy' vs 'Salad heavy'
+@st.cache_data(ttl=3600)
+def build_category_fig(selected_locations, business_date):
+    df_cat_mix = load_category_mix(business_date)
+    df_cat_filtered = filter_restaurants(df_cat_mix, selected_locations)
+    df_cat_totals = df_cat_filtered.groupby('item_category', as_index=False, observed=True, sort=False)['daily_revenue'].sum()
+    return px.bar(
+        df_cat_totals.sort_values('daily_revenue', ascending=False),
+        x="item_category",
+        y="daily_revenue",
+        color="item_category",
+        title="Revenue Distribution by Category",
+        text_auto='.2s'
+    )
+
+# Nothing to filter or plot with an empty selection; the rest of the page still renders
+if not selected_locations:
+    st.warning("Pick at least one restaurant to render trends.")
 else:
-    df_plot = df_filtered.groupby(['order_date', 'restaurant_id'])['daily_revenue'].sum().reset_index()
-    x_axis = "order_date"
-
-# 4. Plot: Revenue over Time by Location
-st.subheader(f"{time_grain} Revenue by Restaurant")
-fig_sales = px.line(
-    df_plot,
-    x=x_axis,
-    y="daily_revenue",
-    color="restaurant_id",
-    title=f"Total Sales Trend ({time_grain})",
-    labels={"daily_revenue": "Revenue ($)", "order_date": "Date"},
-    render_mode="svg" # Cleaner lines for time series
-)
-st.plotly_chart(fig_sales, use_container_width=True)
+    # 3. Plot: Revenue over Time by Location
+    st.subheader(f"{time_grain} Revenue by Restaurant")
+    st.plotly_chart(build_sales_fig(selected_key, time_grain, business_date), use_container_width=True)
 
-# 5. Plot: Category Mix (The "Resource Planning" Chart)
-st.subheader("Item Category Performance")
-# This helps identify if a location is 'Breakfast heavy' vs 'Salad heavy'
-fig_cat = px.bar(
-    df_filtered.groupby('item_category')['daily_revenue'].sum().sort_values(ascending=False).reset_index(),
-    x="item_category",
-    y="daily_revenue",
-    color="item_category",
-    title="Revenue Distribution by Category",
-    text_auto='.2s'
-)
-st.plotly_chart(fig_cat, use_container_width=True)
+    # 4. Plot: Category Mix (The "Resource Planning" Chart)
+    st.subheader("Item Category Performance")
+    st.plotly_chart(build_category_fig(selected_key, business_date), use_container_width=True)
 
 
 
@@ -419,17 +615,23 @@ st.header("5. Top-Performing Locations")
 
 # 1. Aggregate Data by Restaurant
 # We take the daily trends and roll them up to a per-restaurant summary
-df_store_perf = df_trends.groupby('restaurant_id').agg({
-    'daily_revenue': ['sum', 'mean'],
-    'daily_order_count': 'mean',
-    'order_date': 'nunique' # To find the number of days the store was active
-}).reset_index()
-
-# Flatten the multi-index columns
-df_store_perf.columns = [
-    'restaurant_id', 'total_revenue', 'avg_daily_revenue', 
-    'avg_daily_orders', 'days_active'
-]
+restaurants = df_trends['restaurant_id'].cat.categories
+total_rev, rev_count, sum_orders, order_count, days_active = store_stats(
+    df_trends['restaurant_id'].cat.codes.to_numpy(),
+    df_trends['order_date'].to_numpy().astype('datetime64[D]').astype('int64'),
+    df_trends['daily_revenue'].to_numpy(dtype='float64', na_value=np.nan),
+    df_trends['daily_order_count'].to_numpy(dtype='float64', na_value=np.nan),
+    len(restaurants)
+)
+
+df_store_perf = pd.DataFrame({
+    'restaurant_id': restaurants,
+    'total_revenue': total_rev,
+    'avg_daily_revenue': total_rev / rev_count,
+    'avg_daily_orders': sum_orders / order_count,
+    'days_active': days_active # Number of distinct days the store was active
+})
+df_store_perf = df_store_perf[df_store_perf['days_active'] > 0]
 
 # Calculate additional metrics
 df_store_perf['avg_order_value'] = df_store_perf['total_revenue'] / (df_store_perf['avg_daily_orders'] * df_store_perf['days_active'])
@@ -495,6 +697,7 @@ fig_eff = px.scatter(
     size="total_revenue",
     color="restaurant_id",
     hover_name="restaurant_id",
+    render_mode="webgl",
     title="Average Order Value vs. Daily Order Volume",
     labels={
         "avg_daily_orders": "Avg Orders per Day",
@@ -525,12 +728,19 @@ st.header("6. Loyalty Program Impact")
 
 # 1. Data Prep with proper Boolean handling
 # Athena booleans can come in as True/False, 'true'/'false', or 1/0
-df_loyalty['is_loyalty'] = df_loyalty['is_loyalty'].astype(str).str.lower()
-df_loyalty['Status'] = df_loyalty['is_loyalty'].map({'true': 'Loyalty Member', '1': 'Loyalty Member', 'false': 'Non-Member', '0': 'Non-Member'})
+is_loyalty = df_loyalty['is_loyalty']
+if not pd.api.types.is_bool_dtype(is_loyalty):
+    # Unrecognised values (including NULL) stay NA rather than becoming Non-Member
+    is_loyalty = is_loyalty.astype(str).str.lower().map({'true': True, '1': True, 'false': False, '0': False})
+df_loyalty['Status'] = is_loyalty.astype('boolean').map({True: 'Loyalty Member', False: 'Non-Member'}).astype('category')
+
+# Per-Customer LTV (Total LTV / Total Customers)
+df_loyalty['avg_ltv_per_customer'] = df_loyalty['total_lifetime_value'] / df_loyalty['total_customers']
 
 # 2. Executive Metrics
-member_stats = df_loyalty[df_loyalty['Status'] == 'Loyalty Member'].iloc[0]
-non_member_stats = df_loyalty[df_loyalty['Status'] == 'Non-Member'].iloc[0]
+loyalty_rows = df_loyalty.set_index('Status').to_dict(orient='index')
+member_stats = loyalty_rows['Loyalty Member']
+non_member_stats = loyalty_rows['Non-Member']
 
 # Calculate Metrics
 aov_diff = ((member_stats['avg_order_value'] - non_member_stats['avg_order_value']) / non_member_stats['avg_order_value']) * 100
@@ -588,10 +798,7 @@ In contrast, Loyalty Members spend less per visit (**${member_stats['avg_order_v
 
 st.subheader("Customer Lifetime Value (LTV) by Loyalty Status")
 
-# 1. Calculate Per-Customer LTV (Total LTV / Total Customers)
-df_loyalty['avg_ltv_per_customer'] = df_loyalty['total_lifetime_value'] / df_loyalty['total_customers']
-
-# 2. Create Side-by-Side Columns
+# 1. Create Side-by-Side Columns
 col_ltv_per, col_ltv_total = st.columns(2)
 
 with col_ltv_per:
@@ -622,9 +829,9 @@ with col_ltv_total:
     fig_total_share.update_traces(textinfo='percent+label')
     st.plotly_chart(fig_total_share, use_container_width=True)
 
-# 3. Dynamic Insight based on the side-by-side view
-member_ltv = df_loyalty[df_loyalty['Status'] == 'Loyalty Member']['avg_ltv_per_customer'].iloc[0]
-non_member_ltv = df_loyalty[df_loyalty['Status'] == 'Non-Member']['avg_ltv_per_customer'].iloc[0]
+# 2. Dynamic Insight based on the side-by-side view
+member_ltv = member_stats['avg_ltv_per_customer']
+non_member_ltv = non_member_stats['avg_ltv_per_customer']
 
 st.info(f"""
 **💡 Data Insight:** Non-Members currently dominate the **Total Revenue Share** (left); an individual Non-Member is worth {non_member_ltv:,.2f} compared to {member_ltv:,.2f} for a Loyalty Member.
@@ -635,17 +842,26 @@ Highest-spending "Whales" are currently operating outside the loyalty program. R
 st.markdown("---")
 st.header("7. Pricing & Discount Effectiveness")
 
-# Define Data
-discount_data = {
-    'Status': ['Discounted', 'Full Price'],
-    'Order Count': [9150, 122178],
-    'Total Revenue': [4695684.17, 13343599.60],
-    'AOV': [113.87, 52.83]
-}
-df_disc = pd.DataFrame(discount_data)
+# Define Data once per process; the figures are fixed, so nothing here changes between reruns
+@st.cache_data
+def discount_summary():
+    df_disc = pd.DataFrame({
+        'Status': ['Discounted', 'Full Price'],
+        'Order Count': [9150, 122178],
+        'Total Revenue': [4695684.17, 13343599.60],
+        'AOV': [113.87, 52.83]
+    })
+    disc, full = df_disc.iloc[0], df_disc.iloc[1]
+
+    # Calculate Lift
+    aov_lift = ((disc['AOV'] - full['AOV']) / full['AOV']) * 100
+
+    # Calculate % of total orders vs % of total revenue
+    disc_order_pct = (disc['Order Count'] / df_disc['Order Count'].sum()) * 100
+    disc_rev_pct = (disc['Total Revenue'] / df_disc['Total Revenue'].sum()) * 100
+    return df_disc, aov_lift, disc_order_pct, disc_rev_pct
 
-# Calculate Lift
-aov_lift = ((113.87 - 52.83) / 52.83) * 100
+df_disc, aov_lift, disc_order_pct, disc_rev_pct = discount_summary()
 
 col1, col2 = st.columns([1, 1])
 
@@ -669,12 +885,6 @@ with col2:
     )
     st.plotly_chart(fig_rev_pie, use_container_width=True)
 
-    # Calculate % of total orders vs % of total revenue
-total_orders = df_disc['Order Count'].sum()
-total_rev = df_disc['Total Revenue'].sum()
-disc_order_pct = (9150 / total_orders) * 100
-disc_rev_pct = (4695684 / total_rev) * 100
-
 st.write("### Discount ROI")
 c1, c2, c3 = st.columns(3)
 
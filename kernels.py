@@ -0,0 +1,49 @@
+# Numba kernels for the dashboard. They live outside app.py so Streamlit reruns
+# don't redefine (and re-JIT) them on every interaction; cache=True reuses the
+# compiled code across processes, and the Docker build pre-populates that cache.
+import numpy as np
+from numba import njit, types
+
+
+NAT_INT = np.iinfo(np.int64).min
+
+# Compiled eagerly (and cached to disk) for every width pandas uses for category
+# codes, so no restaurant count leaves a JIT compile for the first render
+def _readonly(dtype):
+    # pandas hands out read-only views under copy-on-write; writable arrays still match
+    return types.Array(dtype, 1, 'A', readonly=True)
+
+
+STORE_STATS_SIGNATURES = [
+    (_readonly(code_type), _readonly(types.int64), _readonly(types.float64), _readonly(types.float64), types.int64)
+    for code_type in (types.int8, types.int16, types.int32)
+]
+
+
+@njit(STORE_STATS_SIGNATURES, cache=True)
+def store_stats(codes, dates, revenue, orders, n_groups):
+    # One pass over rows sorted by (store, date): revenue/order sums with their
+    # non-null counts, plus the number of distinct dates per store
+    total_rev = np.zeros(n_groups)
+    rev_count = np.zeros(n_groups, dtype=np.int64)
+    sum_orders = np.zeros(n_groups)
+    order_count = np.zeros(n_groups, dtype=np.int64)
+    days_active = np.zeros(n_groups, dtype=np.int64)
+    prev_code = -1
+    prev_date = 0
+    for i in range(codes.size):
+        code = codes[i]
+        if code < 0:
+            continue
+        if not np.isnan(revenue[i]):
+            total_rev[code] += revenue[i]
+            rev_count[code] += 1
+        if not np.isnan(orders[i]):
+            sum_orders[code] += orders[i]
+            order_count[code] += 1
+        # NaT (int64 min) sorts last and isn't a distinct active day
+        if dates[i] != NAT_INT and (code != prev_code or dates[i] != prev_date):
+            days_active[code] += 1
+        prev_code = code
+        prev_date = dates[i]
+    return total_rev, rev_count, sum_orders, order_count, days_active